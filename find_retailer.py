@@ -1,30 +1,101 @@
-import json
+import asyncio
 import re
 import csv
 import os
-import time
 import random
+import time
 import urllib.parse
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import orjson
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from playwright_stealth import Stealth
 
+try:
+    import hyperscan  # optional — faster multi-pattern scan, falls back to re
+except ImportError:
+    hyperscan = None
+
 HEADLESS = False
+USER_DATA_DIR = ".pw-cache/retailers"   # persistent browser profile (HTTP cache, cookies)
 MAX_RESULTS = 15
-DELAY_BETWEEN_PAGES = (2, 5)  # random seconds between retailer page visits
+DELAY_BETWEEN_PAGES = (2, 5)  # random seconds between visits to the same retailer
+MAX_CONCURRENT_PAGES = 5      # retailer pages visited in parallel
+SEARCH_CACHE_SIZE = 512       # normalised titles remembered per run (LRU)
+PRICE_RANGE = (0.5, 50000)    # realistic product price bounds
+BODY_PRICE_RANGE = (5, 10000) # tighter bounds for loose body-text matches
+BODY_TEXT_LIMIT = 32768       # chars of body text read from the first "$"
+
+# Nodes that actually carry a price — JSON-LD is left out because Organization /
+# Breadcrumb blocks in <head> would match before the body has been parsed
+PRICE_READY_SELECTOR = (
+    "[itemprop='price'], "
+    "meta[property='product:price:amount'], "
+    "[class*='price']"
+)
+
+_PRICE_RE = re.compile(r"\d+[.,]?\d{0,2}")
+_DOLLAR_RE = re.compile(r"\$\s*(\d+[.,]?\d{0,2})")
+_UDDG_RE = re.compile(r"[?&]uddg=([^&]+)")
+_BLOCKED_DOMAIN_RE = re.compile(r"ebay|amazon|catch|kogan", re.IGNORECASE)
+_TRACKER_RE = re.compile(r"googletagmanager|google-analytics|doubleclick|facebook|hotjar", re.IGNORECASE)
+
+# Block-page keywords, scanned in a single pass. Headings only count the first three.
+_DENIED_PATTERNS = [r"access denied", r"\b403\b", r"blocked", r"captcha", r"just a moment"]
+_HEADING_DENIED_IDS = {0, 1, 2}
+
+if hyperscan is not None:
+    _DENIED_DB = hyperscan.Database()
+    _DENIED_DB.compile(
+        expressions=[p.encode() for p in _DENIED_PATTERNS],
+        ids=list(range(len(_DENIED_PATTERNS))),
+        elements=len(_DENIED_PATTERNS),
+        flags=[hyperscan.HS_FLAG_CASELESS] * len(_DENIED_PATTERNS),
+    )
+else:
+    _DENIED_RE = re.compile(
+        "|".join(f"(?P<k{i}>{p})" for i, p in enumerate(_DENIED_PATTERNS)),
+        re.IGNORECASE,
+    )
+
+# Variant words dropped from cache keys so "Red / Large" and "Blue / Large" share one search
+_TITLE_STOPWORDS = {
+    "black", "white", "grey", "gray", "silver", "red", "blue", "green",
+    "pink", "purple", "yellow", "orange", "brown", "beige", "navy",
+    "small", "medium", "large", "xs", "xl", "xxl", "xxxl",
+}
+_search_cache = {}
+_last_visit = {}   # retailer host → time.monotonic() its latest goto starts at
+
+# Price extraction only reads DOM text, so none of these are ever needed
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media", "stylesheet"}
 
 
 # -------------------------
 # PRICE HELPERS
 # -------------------------
-def is_access_denied(page):
+def denied_keyword_ids(text):
+    """Return the indexes of every _DENIED_PATTERNS entry found in text."""
+    if hyperscan is not None:
+        found = set()
+
+        def on_match(pattern_id, start, end, flags, context):
+            found.add(pattern_id)
+
+        _DENIED_DB.scan(text.encode("utf-8"), match_event_handler=on_match)
+        return found
+
+    return {int(m.lastgroup[1:]) for m in _DENIED_RE.finditer(text)}
+
+
+async def is_access_denied(page):
     try:
-        title = page.title().lower()
-        if any(x in title for x in ["access denied", "403", "blocked", "captcha", "just a moment"]):
+        title, headings = await page.evaluate("""() => [
+            document.title,
+            Array.from(document.querySelectorAll('h1, h2')).map(h => h.innerText).join('\\n')
+        ]""")
+        if denied_keyword_ids(title):
+            return True
+        if denied_keyword_ids(headings) & _HEADING_DENIED_IDS:
             return True
-        for selector in ["h1", "h2"]:
-            for el in page.query_selector_all(selector):
-                if any(x in el.inner_text().lower() for x in ["access denied", "403", "blocked"]):
-                    return True
     except Exception:
         pass
     return False
@@ -34,7 +105,7 @@ def parse_price(price_str):
     """Return float if price is in a realistic product range, else None."""
     try:
         value = float(str(price_str).replace(",", "").replace("$", "").strip())
-        if 0.5 <= value <= 50000:
+        if PRICE_RANGE[0] <= value <= PRICE_RANGE[1]:
             return value
     except (ValueError, AttributeError):
         pass
@@ -44,79 +115,98 @@ def parse_price(price_str):
 # -------------------------
 # PRICE EXTRACTION LOGIC
 # -------------------------
-def extract_price_from_page(page):
+# Body text starting at the first "$", capped so large pages don't cross IPC whole
+BODY_TEXT_JS = """limit => {
+    const text = document.body.innerText;
+    const start = Math.max(0, text.indexOf('$'));
+    return text.slice(start, start + limit);
+}"""
+
+# Price sources ranked by hit rate — the page-side script stops at the first valid one.
+# JSON-LD <script> nodes are parsed for offers.price; everything else uses its
+# content attribute or text.
+PRICE_SELECTORS = [
+    "[itemprop='price']",
+    "meta[property='product:price:amount']",
+    "script[type='application/ld+json']",
+    ".product-price",
+    ".offer-price",
+    ".price",
+    "[data-testid*='price']",
+    "[class*='price']",
+]
+
+# Runs inside the page and returns the first in-range price, or null.
+# Mirrors parse_price so an out-of-range match doesn't end the search.
+PRICE_EXTRACT_JS = """([selectors, pattern, minPrice, maxPrice]) => {
+    const priceRe = new RegExp(pattern);
+
+    function valid(price) {
+        const value = Number(String(price).replace(/[,$]/g, '').trim());
+        return String(price).trim() !== '' && value >= minPrice && value <= maxPrice;
+    }
+
+    // Recursively collect text, skipping <sup> elements (cent superscripts)
+    function getText(node) {
+        if (node.nodeType === 3) return node.textContent;
+        if (node.nodeName === 'SUP') return '';
+        return Array.from(node.childNodes).map(getText).join('');
+    }
+
+    function fromJsonLd(script) {
+        try {
+            const data = JSON.parse(script.textContent);
+            const offers = data && !Array.isArray(data) ? data.offers : null;
+            if (offers && typeof offers === 'object' && !Array.isArray(offers) && 'price' in offers) {
+                const price = String(offers.price);
+                return valid(price) ? price : null;
+            }
+        } catch (e) {}
+        return null;
+    }
+
+    function fromElement(el) {
+        // content attributes hold a bare price — validate it whole, like parse_price
+        const content = el.getAttribute('content');
+        if (content) return valid(content) ? content : null;
+        const match = getText(el).trim().match(priceRe);
+        return match && valid(match[0]) ? match[0] : null;
+    }
+
+    for (const sel of selectors) {
+        for (const el of document.querySelectorAll(sel)) {
+            const price = el.nodeName === 'SCRIPT' ? fromJsonLd(el) : fromElement(el);
+            if (price) return price;
+        }
+    }
+    return null;
+}"""
+
+
+async def extract_price_from_page(page):
 
     # 0️⃣ Skip blocked / access-denied pages
-    if is_access_denied(page):
+    if await is_access_denied(page):
         print("[LOG] Access denied / blocked page — skipping price extraction")
         return None
 
-    # 1️⃣ JSON-LD structured data
-    scripts = page.query_selector_all("script[type='application/ld+json']")
-    for script in scripts:
-        try:
-            data = json.loads(script.inner_text())
-            if isinstance(data, dict) and "offers" in data:
-                offers = data["offers"]
-                if isinstance(offers, dict) and "price" in offers:
-                    price = str(offers["price"])
-                    if parse_price(price) is not None:
-                        return price
-        except Exception:
-            continue
-
-    # 2️⃣ Meta property price
-    meta = page.query_selector("meta[property='product:price:amount']")
-    if meta:
-        price = meta.get_attribute("content")
-        if parse_price(price) is not None:
+    # 1️⃣–3️⃣ Structured data and price selectors, first valid match wins
+    try:
+        price = await page.evaluate(
+            PRICE_EXTRACT_JS, [PRICE_SELECTORS, _PRICE_RE.pattern, *PRICE_RANGE]
+        )
+        if price and parse_price(price) is not None:
             return price
+    except Exception:
+        pass
 
-    # 3️⃣ Common ecommerce selectors — exclude <sup> nodes (cent superscripts)
-    selectors = [
-        "[itemprop='price']",
-        ".price",
-        ".product-price",
-        "[class*='price']",
-        "[data-testid*='price']",
-        ".offer-price"
-    ]
-
-    for sel in selectors:
-        elements = page.query_selector_all(sel)
-        for el in elements:
-            try:
-                # Recursively collect text, skipping <sup> elements
-                text = el.evaluate("""el => {
-                    function getText(node) {
-                        if (node.nodeType === 3) return node.textContent;
-                        if (node.nodeName === 'SUP') return '';
-                        return Array.from(node.childNodes).map(getText).join('');
-                    }
-                    return getText(el);
-                }""").strip()
-            except Exception:
-                text = el.inner_text().strip()
-
-            match = re.search(r"\d+[.,]?\d{0,2}", text)
-            if match:
-                price = match.group()
-                if parse_price(price) is not None:
-                    return price
-
-    # 4️⃣ Fallback: find $-prefixed values in body text, return highest in range
+    # 4️⃣ Fallback: first plausible $-prefixed value in (capped) body text
     try:
-        body = page.inner_text("body")
-        matches = re.findall(r"\$\s*(\d+[.,]?\d{0,2})", body)
-
-        prices = []
-        for m in matches:
-            value = parse_price(m)
-            if value is not None:
-                prices.append(value)
-
-        if prices:
-            return str(max(prices))
+        body = await page.evaluate(BODY_TEXT_JS, BODY_TEXT_LIMIT)
+        for match in _DOLLAR_RE.finditer(body):
+            value = parse_price(match.group(1))
+            if value is not None and BODY_PRICE_RANGE[0] <= value <= BODY_PRICE_RANGE[1]:
+                return str(value)
     except Exception:
         pass
 
@@ -124,42 +214,98 @@ def extract_price_from_page(page):
 
 
 
+# -------------------------
+# BROWSER SETUP
+# -------------------------
+async def block_heavy_resources(route):
+    request = route.request
+    # Never block the page we're navigating to — ad iframes still get the tracker check
+    if request.is_navigation_request() and request.frame.parent_frame is None:
+        await route.continue_()
+        return
+
+    host = urllib.parse.urlsplit(request.url).hostname or ""
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or _TRACKER_RE.search(host):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def launch_context(p):
+    """Launch one stealth Chromium context to be shared across all items.
+
+    The profile in USER_DATA_DIR persists between runs, so HTTP cache and
+    TLS sessions for retailers we've already visited are reused.
+    """
+    context = await p.chromium.launch_persistent_context(
+        USER_DATA_DIR,
+        headless=HEADLESS,
+        args=["--disable-blink-features=AutomationControlled"],
+        locale="en-AU",
+        timezone_id="Australia/Sydney",
+        viewport={"width": 1366, "height": 768},
+        user_agent=(
+            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+            "AppleWebKit/537.36 (KHTML, like Gecko) "
+            "Chrome/131.0.0.0 Safari/537.36"
+        )
+    )
+    await context.route("**/*", block_heavy_resources)
+
+    # Every item opens its own pages, so drop the blank tab the profile starts with
+    for page in context.pages:
+        await page.close()
+    return context
+
+
 # -------------------------
 # DUCKDUCKGO SEARCH LOGIC
 # -------------------------
-def search_duckduckgo(title):
+def normalize_title(title):
+    """Lowercase, collapse whitespace and drop colour/size and separator tokens."""
+    words = title.lower().split()
+    return " ".join(
+        w for w in words
+        if w not in _TITLE_STOPWORDS and any(c.isalnum() for c in w)
+    )
+
+
+async def wait_for_host(host):
+    """Sleep until DELAY_BETWEEN_PAGES has passed since the host's last goto.
+
+    Call while holding a page slot, right before navigating. The visit time is
+    booked before sleeping (no await in between), so concurrent tasks for the
+    same host queue up behind each other while other hosts aren't held up.
+    """
+    now = time.monotonic()
+    last = _last_visit.get(host)
+    visit_at = now if last is None else max(now, last + random.uniform(*DELAY_BETWEEN_PAGES))
+    _last_visit[host] = visit_at
+    await asyncio.sleep(visit_at - now)
+
+
+async def search_duckduckgo(title, context):
+    cache_key = normalize_title(title)
+    if cache_key in _search_cache:
+        print(f"[LOG] Reusing cached retailers for: {cache_key}")
+        # Move to the end so eviction drops the least recently used title
+        _search_cache[cache_key] = _search_cache.pop(cache_key)
+        return list(_search_cache[cache_key])
+
     query = f'{title} -ebay -amazon -catch -kogan'
     encoded_query = urllib.parse.quote(query)
 
     # Force AU region
     search_url = f"https://duckduckgo.com/html/?q={encoded_query}&kl=au-en"
 
-    retailer_data = []
-
-    with Stealth().use_sync(sync_playwright()) as p:
-        browser = p.chromium.launch(
-            headless=HEADLESS,
-            args=["--disable-blink-features=AutomationControlled"]
-        )
-        context = browser.new_context(
-            locale="en-AU",
-            timezone_id="Australia/Sydney",
-            viewport={"width": 1366, "height": 768},
-            user_agent=(
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/131.0.0.0 Safari/537.36"
-            )
-        )
-
-        page = context.new_page()
-
+    page = await context.new_page()
+    try:
         print("[LOG] Opening DuckDuckGo (AU region)...")
-        page.goto(search_url, timeout=60000)
+        await page.goto(search_url, timeout=60000)
 
-        page.wait_for_selector("a.result__a", timeout=15000)
+        await page.wait_for_selector("a.result__a", timeout=15000)
 
-        links = page.query_selector_all("a.result__a")
+        links = await page.query_selector_all("a.result__a")
         print(f"[LOG] Found {len(links)} search results")
 
         clean_results = []
@@ -168,7 +314,7 @@ def search_duckduckgo(title):
         # CLEAN & DECODE LINKS
         # -------------------------
         for link in links:
-            href = link.get_attribute("href")
+            href = await link.get_attribute("href")
             if not href:
                 continue
 
@@ -177,68 +323,116 @@ def search_duckduckgo(title):
                 href = "https:" + href
 
             # Extract real URL from DuckDuckGo redirect
-            if "uddg=" in href:
-                parsed = urllib.parse.urlparse(href)
-                query_params = urllib.parse.parse_qs(parsed.query)
-
-                if "uddg" in query_params:
-                    real_url = query_params["uddg"][0]
-                    real_url = urllib.parse.unquote(real_url)
-                else:
-                    continue
-            else:
-                real_url = href
+            match = _UDDG_RE.search(href)
+            real_url = urllib.parse.unquote(match.group(1)) if match else href
 
             # Filter AU retailer domains
-            if (
-                ".com.au" in real_url
-                and all(x not in real_url.lower()
-                        for x in ["ebay", "amazon", "catch", "kogan"])
-            ):
+            if ".com.au" in real_url and not _BLOCKED_DOMAIN_RE.search(real_url):
                 clean_results.append(real_url)
 
             if len(clean_results) >= MAX_RESULTS:
                 break
 
         print(f"[LOG] Filtered {len(clean_results)} AU retailer links")
-
-        # -------------------------
-        # VISIT RETAILER PAGES
-        # -------------------------
-        for url in clean_results:
-            product_page = context.new_page()
+    finally:
+        await page.close()
+
+    # -------------------------
+    # VISIT RETAILER PAGES
+    # -------------------------
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+
+    async def visit(url):
+        async with semaphore:
+            # Spacing is measured between real navigations, so it's applied inside the slot
+            await wait_for_host(urllib.parse.urlsplit(url).netloc)
+            product_page = await context.new_page()
             try:
-                delay = random.uniform(*DELAY_BETWEEN_PAGES)
-                time.sleep(delay)
                 print(f"[LOG] Visiting: {url}")
-                product_page.goto(url, timeout=30000, wait_until="domcontentloaded")
-
-                price = extract_price_from_page(product_page)
+                await product_page.goto(url, timeout=30000, wait_until="commit")
+
+                # Don't wait for the whole DOM — just for something we can read a price from
+                try:
+                    await product_page.wait_for_selector(
+                        PRICE_READY_SELECTOR, state="attached", timeout=8000
+                    )
+                except PlaywrightTimeoutError:
+                    # No price nodes (e.g. JSON-LD-only pages) — at least let the DOM finish
+                    print(f"[LOG] No price nodes yet, waiting for DOM ({url})")
+                    try:
+                        await product_page.wait_for_load_state("domcontentloaded", timeout=10000)
+                    except PlaywrightTimeoutError:
+                        print(f"[LOG] DOM still loading, extracting from current DOM ({url})")
+
+                price = await extract_price_from_page(product_page)
 
                 if price:
-                    print(f"[LOG] ✅ Price found: {price}")
+                    print(f"[LOG] ✅ Price found: {price} ({url})")
                 else:
-                    print("[LOG] ❌ Price not found")
-                retailer_data.append({
+                    print(f"[LOG] ❌ Price not found ({url})")
+                return {
                     "url": url,
                     "price": price if price else "price not found"
-                })
+                }
 
             except PlaywrightTimeoutError:
                 print(f"[WARN] Page timed out, skipping: {url}")
             except Exception as e:
                 print(f"[ERROR] Failed to process {url}: {e}")
             finally:
-                product_page.close()
+                await product_page.close()
+
+    # gather preserves search-result order
+    results = await asyncio.gather(*(visit(url) for url in clean_results))
+    retailer_data = [r for r in results if r]
 
-        browser.close()
+    if len(_search_cache) >= SEARCH_CACHE_SIZE:
+        _search_cache.pop(next(iter(_search_cache)))
+    _search_cache[cache_key] = retailer_data
 
-    return retailer_data
+    return list(retailer_data)
 
 
 # -------------------------
 # MAIN
 # -------------------------
+async def process_csv(csv_file, output_folder):
+    async with Stealth().use_async(async_playwright()) as p:
+        context = await launch_context(p)
+
+        try:
+            # Stream rows — items whose JSON already exists were done by an earlier run
+            with open(csv_file, newline="", encoding="utf-8") as f:
+                for item in csv.DictReader(f):
+                    item_id = item["itemID"]
+                    title = item["title"]
+
+                    out_path = os.path.join(output_folder, f"{item_id}.json")
+                    if os.path.exists(out_path):
+                        print(f"[INFO] Skipping item {item_id} — already saved to {out_path}")
+                        continue
+
+                    print(f"\n[INFO] Processing item {item_id}: {title}")
+
+                    results = await search_duckduckgo(title, context)
+
+                    # Write then rename, so a killed run never leaves a truncated file to skip
+                    tmp_path = out_path + ".tmp"
+                    with open(tmp_path, "wb") as out:
+                        out.write(orjson.dumps({
+                            "itemID": item_id,
+                            "title": title,
+                            "price": item["price"],
+                            "quantitysold": item["quantitysold"],
+                            "retailers": results
+                        }, option=orjson.OPT_INDENT_2))
+                    os.replace(tmp_path, out_path)
+
+                    print(f"[INFO] Saved {len(results)} retailers → {out_path}")
+        finally:
+            await context.close()
+
+
 if __name__ == "__main__":
     csv_file = input("Enter path to store results CSV: ").strip()
 
@@ -250,27 +444,4 @@ if __name__ == "__main__":
     os.makedirs(output_folder, exist_ok=True)
     print(f"[INFO] Saving results to folder: {output_folder}/")
 
-    with open(csv_file, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        items = list(reader)
-
-    print(f"[INFO] Loaded {len(items)} items from {csv_file}")
-
-    for item in items:
-        item_id = item["itemID"]
-        title = item["title"]
-        print(f"\n[INFO] Processing item {item_id}: {title}")
-
-        results = search_duckduckgo(title)
-
-        out_path = os.path.join(output_folder, f"{item_id}.json")
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump({
-                "itemID": item_id,
-                "title": title,
-                "price": item["price"],
-                "quantitysold": item["quantitysold"],
-                "retailers": results
-            }, f, indent=4)
-
-        print(f"[INFO] Saved {len(results)} retailers → {out_path}")
+    asyncio.run(process_csv(csv_file, output_folder))
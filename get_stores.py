@@ -1,6 +1,8 @@
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 from datetime import datetime, timedelta
-import time
+from functools import lru_cache
+import asyncio
+import random
 import csv
 
 # -------- CONFIG --------
@@ -9,39 +11,75 @@ DAYS_LIMIT = 14
 MIN_SALES = 3
 MAX_ITEMS = 10          # stop after finding this many items with >= MIN_SALES changes
 HEADLESS = False
-DELAY_BETWEEN_ITEMS = 1.5
+USER_DATA_DIR = ".pw-cache/ebay"   # persistent browser profile (HTTP cache, cookies)
+DELAY_BETWEEN_ITEMS = 1.5     # average jitter (seconds) before each revision page
+MAX_CONCURRENT_REVISIONS = 6  # revision pages checked concurrently
 # ------------------------
 
-def parse_sold_date(text):
-    cleaned = text.replace("Sold", "").strip()
+# (date, change type) for every revision row, newest first, in one round-trip
+REVISION_ROWS_JS = """() => Array.from(document.querySelectorAll('table tbody tr'))
+    .reverse()
+    .map(row => {
+        const cells = row.querySelectorAll('td');
+        return cells.length >= 3 ? [cells[0].innerText.trim(), cells[2].innerText.trim()] : null;
+    })
+    .filter(Boolean)"""
+
+_MONTHS = {
+    "Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+    "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12,
+}
+
+
+@lru_cache(maxsize=1024)
+def parse_date(text):
+    """Parse "18 Feb 2026", "18 Feb, 2026" or "Feb 18, 2026" — None if unrecognised."""
+    parts = text.replace(",", " ").split()
+    if len(parts) != 3:
+        return None
+
+    if parts[0].isdigit():
+        day, month, year = parts       # AU format
+    else:
+        month, day, year = parts       # US fallback (if ever used)
+
+    month = _MONTHS.get(month.title())
+    if month is None or not day.isdigit() or not year.isdigit():
+        return None
 
     try:
-        # AU format: 18 Feb 2026
-        return datetime.strptime(cleaned, "%d %b %Y")
+        return datetime(int(year), month, int(day))
     except ValueError:
-        try:
-            # US fallback (if ever used)
-            return datetime.strptime(cleaned, "%b %d, %Y")
-        except ValueError:
-            print(f"[WARN] Could not parse sold date: {cleaned}")
-            return None
+        return None
+
+
+def parse_sold_date(text):
+    cleaned = text.replace("Sold", "").strip()
+
+    sold_date = parse_date(cleaned)
+    if sold_date is None:
+        print(f"[WARN] Could not parse sold date: {cleaned}")
+    return sold_date
 
 
 def parse_revision_date(date_text):
-    return datetime.strptime(date_text.strip(), "%b %d, %Y")
+    return parse_date(date_text.strip())
 
 
-def count_quantity_revisions(context, item_id, cutoff_date):
+async def count_quantity_revisions(context, item_id, cutoff_date):
     revision_url = f"{BASE_URL}/rvh/{item_id}"
-    rev_page = context.new_page()
+
+    # Per-task jitter keeps requests to eBay spread out without a global sleep
+    await asyncio.sleep(DELAY_BETWEEN_ITEMS * random.uniform(0.5, 1.5))
+    rev_page = await context.new_page()
 
     try:
         print(f"[LOG] Opening revision page: {revision_url}")
-        rev_page.goto(revision_url, timeout=60000)
+        await rev_page.goto(revision_url, timeout=60000)
 
-        rev_page.wait_for_selector("table tbody tr", timeout=15000)
+        await rev_page.wait_for_selector("table tbody tr", timeout=15000)
 
-        rows = rev_page.query_selector_all("table tbody tr")
+        rows = await rev_page.evaluate(REVISION_ROWS_JS)
 
         if not rows:
             print(f"[LOG] No revision rows found for {item_id}")
@@ -51,19 +89,11 @@ def count_quantity_revisions(context, item_id, cutoff_date):
 
         count = 0
 
-        # REVERSE rows → newest first
-        for row in reversed(rows):
-
-            cells = row.query_selector_all("td")
-            if len(cells) < 3:
-                continue
-
-            date_text = cells[0].inner_text().strip()
-            change_type = cells[2].inner_text().strip()
+        # Rows arrive newest first
+        for date_text, change_type in rows:
 
-            try:
-                revision_date = datetime.strptime(date_text, "%d %b, %Y")
-            except:
+            revision_date = parse_revision_date(date_text)
+            if revision_date is None:
                 continue
 
             # STOP when older than 14 days
@@ -82,86 +112,109 @@ def count_quantity_revisions(context, item_id, cutoff_date):
         return 0
 
     finally:
-        rev_page.close()
-    
+        await rev_page.close()
 
 
-def scrape_store(store_name):
+
+async def scrape_store(store_name):
     sales_count = {}
     item_details = {}
     qualified_count = 0
 
     cutoff_date = datetime.now() - timedelta(days=DAYS_LIMIT)
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=HEADLESS)
-        context = browser.new_context()
-        page = context.new_page()
-
-        page_number = 1
-        stop_scraping = False
-
-        while not stop_scraping:
-            url = (
-                f"{BASE_URL}/sch/i.html"
-                f"?_ssn={store_name}"
-                f"&LH_Sold=1&LH_Complete=1&_sop=13&_ipg=200&_pgn={page_number}"
-            )
+    async with async_playwright() as p:
+        context = await p.chromium.launch_persistent_context(USER_DATA_DIR, headless=HEADLESS)
+        # A persistent context starts with one page already open
+        page = context.pages[0] if context.pages else await context.new_page()
 
-            print(f"\nScraping page {page_number}...")
-            page.goto(url, timeout=60000)
-            page.wait_for_selector("li.s-card", timeout=10000)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REVISIONS)
 
-            listings = page.query_selector_all("li.s-card")
-            if not listings:
-                break
-
-            for listing in listings:
+        try:
+            page_number = 1
+            stop_scraping = False
+
+            while not stop_scraping:
+                url = (
+                    f"{BASE_URL}/sch/i.html"
+                    f"?_ssn={store_name}"
+                    f"&LH_Sold=1&LH_Complete=1&_sop=13&_ipg=200&_pgn={page_number}"
+                )
 
-                item_id = listing.get_attribute("data-listingid")
-                sold_span = listing.query_selector('span[aria-label="Sold item"]')
+                print(f"\nScraping page {page_number}...")
+                await page.goto(url, timeout=60000)
+                await page.wait_for_selector("li.s-card", timeout=10000)
 
-                if not item_id or not sold_span:
-                    continue
+                listings = await page.query_selector_all("li.s-card")
+                if not listings:
+                    break
 
-                sold_date_text = sold_span.inner_text().strip()
-                sold_date = parse_sold_date(sold_date_text)
+                # Collect this page's in-window listings, then check revisions concurrently
+                candidates = []
+                queued_ids = set()
 
-                if sold_date < cutoff_date:
-                    stop_scraping = True
-                    break
+                for listing in listings:
 
-                title_elem = listing.query_selector("div.s-card__title span")
-                price_elem = listing.query_selector("span.s-card__price")
+                    item_id = await listing.get_attribute("data-listingid")
 
-                title = title_elem.inner_text().strip() if title_elem else ""
-                price = price_elem.inner_text().strip() if price_elem else ""
+                    # eBay's sold results can repeat a listing — only check its revisions once
+                    if not item_id or item_id in sales_count or item_id in queued_ids:
+                        continue
 
-                print(f"Checking revisions for {item_id}...")
+                    sold_span = await listing.query_selector('span[aria-label="Sold item"]')
+                    if not sold_span:
+                        continue
 
-                quantity_count = count_quantity_revisions(
-                    context, item_id, cutoff_date
-                )
+                    sold_date_text = (await sold_span.inner_text()).strip()
+                    sold_date = parse_sold_date(sold_date_text)
 
-                sales_count[item_id] = quantity_count
-                item_details[item_id] = {
-                    "title": title,
-                    "price": price,
-                }
-
-                if quantity_count >= MIN_SALES:
-                    qualified_count += 1
-                    print(f"[INFO] Qualified items so far: {qualified_count}/{MAX_ITEMS}")
-                    if qualified_count >= MAX_ITEMS:
-                        print(f"[INFO] Reached {MAX_ITEMS} qualified items — stopping scrape.")
+                    if sold_date < cutoff_date:
                         stop_scraping = True
                         break
 
-                time.sleep(DELAY_BETWEEN_ITEMS)
-
-            page_number += 1
-
-        browser.close()
+                    title_elem = await listing.query_selector("div.s-card__title span")
+                    price_elem = await listing.query_selector("span.s-card__price")
+
+                    title = (await title_elem.inner_text()).strip() if title_elem else ""
+                    price = (await price_elem.inner_text()).strip() if price_elem else ""
+
+                    candidates.append((item_id, title, price))
+                    queued_ids.add(item_id)
+
+                async def check(item_id):
+                    async with semaphore:
+                        print(f"Checking revisions for {item_id}...")
+                        return await count_quantity_revisions(context, item_id, cutoff_date)
+
+                tasks = [asyncio.create_task(check(item_id)) for item_id, _, _ in candidates]
+                try:
+                    # Checks run concurrently, but results are applied in listing (sold-date)
+                    # order so the MAX_ITEMS cut-off and output order don't depend on timing
+                    for (item_id, title, price), task in zip(candidates, tasks):
+                        quantity_count = await task
+
+                        sales_count[item_id] = quantity_count
+                        item_details[item_id] = {
+                            "title": title,
+                            "price": price,
+                        }
+
+                        if quantity_count >= MIN_SALES:
+                            qualified_count += 1
+                            print(f"[INFO] Qualified items so far: {qualified_count}/{MAX_ITEMS}")
+                            if qualified_count >= MAX_ITEMS:
+                                print(f"[INFO] Reached {MAX_ITEMS} qualified items — stopping scrape.")
+                                stop_scraping = True
+                                break
+                finally:
+                    # Drop checks for listings after the cut-off, queued or in flight
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+
+                page_number += 1
+        finally:
+            await context.close()
 
     return sales_count, item_details
 
@@ -192,13 +245,15 @@ def print_results(sales_count, item_details, store_name):
     with open(csv_filename, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         writer.writerow(["itemID", "quantitysold", "price", "title"])
-        for item_id, count, details in filtered:
-            writer.writerow([item_id, count, details.get("price", ""), details.get("title", "")])
+        writer.writerows(
+            (item_id, count, details.get("price", ""), details.get("title", ""))
+            for item_id, count, details in filtered
+        )
 
     print(f"\n[INFO] Saved {len(filtered)} items to {csv_filename}")
 
 
 if __name__ == "__main__":
     store = input("Enter eBay store name: ").strip()
-    sales_count, item_details = scrape_store(store)
+    sales_count, item_details = asyncio.run(scrape_store(store))
     print_results(sales_count, item_details, store)
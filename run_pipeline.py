@@ -1,9 +1,42 @@
+import asyncio
 import csv
-import json
 import os
 
+import orjson
+from playwright.async_api import async_playwright
+from playwright_stealth import Stealth
+
 from get_stores import scrape_store, MIN_SALES
-from find_retailer import search_duckduckgo
+from find_retailer import launch_context, search_duckduckgo
+
+
+async def find_retailers(filtered, output_folder):
+    # One browser for the whole run — each item only opens fresh pages
+    async with Stealth().use_async(async_playwright()) as p:
+        context = await launch_context(p)
+
+        try:
+            for item_id, count, details in filtered:
+                title = details.get("title", "")
+                price = details.get("price", "")
+
+                print(f"\n[INFO] Processing item {item_id}: {title}")
+
+                retailers = await search_duckduckgo(title, context)
+
+                out_path = os.path.join(output_folder, f"{item_id}.json")
+                with open(out_path, "wb") as f:
+                    f.write(orjson.dumps({
+                        "itemID": item_id,
+                        "title": title,
+                        "ebay_price": price,
+                        "quantitysold": count,
+                        "retailers": retailers
+                    }, option=orjson.OPT_INDENT_2))
+
+                print(f"[INFO] Saved {len(retailers)} retailers → {out_path}")
+        finally:
+            await context.close()
 
 
 def run_pipeline(store_name):
@@ -12,7 +45,7 @@ def run_pipeline(store_name):
     print(f"  STEP 1: Scraping sold listings for store: {store_name}")
     print(f"{'='*60}\n")
 
-    sales_count, item_details = scrape_store(store_name)
+    sales_count, item_details = asyncio.run(scrape_store(store_name))
 
     # ── Step 2: Filter & save CSV ─────────────────────────────────────────────
     filtered = [
@@ -25,8 +58,10 @@ def run_pipeline(store_name):
     with open(csv_filename, "w", newline="", encoding="utf-8") as f:
         writer = csv.writer(f)
         writer.writerow(["itemID", "quantitysold", "price", "title"])
-        for item_id, count, details in filtered:
-            writer.writerow([item_id, count, details.get("price", ""), details.get("title", "")])
+        writer.writerows(
+            (item_id, count, details.get("price", ""), details.get("title", ""))
+            for item_id, count, details in filtered
+        )
 
     print(f"\n[INFO] {len(filtered)} items with >= {MIN_SALES} quantity changes saved to {csv_filename}")
 
@@ -43,25 +78,7 @@ def run_pipeline(store_name):
     os.makedirs(output_folder, exist_ok=True)
     print(f"[INFO] JSON files will be saved to: {output_folder}/")
 
-    for item_id, count, details in filtered:
-        title = details.get("title", "")
-        price = details.get("price", "")
-
-        print(f"\n[INFO] Processing item {item_id}: {title}")
-
-        retailers = search_duckduckgo(title)
-
-        out_path = os.path.join(output_folder, f"{item_id}.json")
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump({
-                "itemID": item_id,
-                "title": title,
-                "ebay_price": price,
-                "quantitysold": count,
-                "retailers": retailers
-            }, f, indent=4)
-
-        print(f"[INFO] Saved {len(retailers)} retailers → {out_path}")
+    asyncio.run(find_retailers(filtered, output_folder))
 
     print(f"\n{'='*60}")
     print(f"  DONE — results saved to {output_folder}/")